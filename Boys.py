@@ -5,7 +5,8 @@ __version__ = 7, 7, 7
 
 import random
 import logging
-import time
+import asyncio
+from telethon.errors import FileReferenceExpiredError
 from telethon.tl.functions.messages import ImportChatInviteRequest
 from herokutl.types import Message
 from .. import loader, utils
@@ -30,7 +31,99 @@ class Boys(loader.Module):
     "sending": "<emoji document_id=5195377464137753198>🤔</emoji>Ищем вам парня.",
     "error": "<emoji document_id=5276240711795107620>⚠️</emoji>Произошла ошибка, чекай логи",
     }
-            
+
+    def __init__(self):
+        self._max_id = 0
+        self._fallback_pool = []
+        self._pool = []
+        self._pool_max_id = 0
+        self._task = None
+        self.max_attempts = 5
+        self.fallback_limit = 50
+        self.pool_limit = 2500
+        self.refresh_interval = 600
+
+    async def client_ready(self, client, db):
+        self.client = client
+        self._db = db
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def on_unload(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _refresh_pool(self):
+        if self._pool_max_id:
+            mes = await self.client.get_messages(entity, limit=None, min_id=self._pool_max_id)
+        else:
+            mes = await self.client.get_messages(entity, limit=self.pool_limit)
+        if not mes:
+            return
+        self._pool_max_id = max(self._pool_max_id, max(msg.id for msg in mes))
+        self._max_id = max(self._max_id, self._pool_max_id)
+        self._pool.extend(sorted((msg for msg in mes if msg.media), key=lambda msg: msg.id))
+        if len(self._pool) > self.pool_limit:
+            del self._pool[:len(self._pool) - self.pool_limit]
+        logger.info(f"Pool updated with {len(mes)} messages, {len(self._pool)} media total")
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self._refresh_pool()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error refreshing pool from {link}: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    async def _learn_id_range(self):
+        if self._max_id:
+            return self._max_id
+        latest = await self.client.get_messages(entity, limit=1)
+        if latest:
+            self._max_id = latest[0].id
+        return self._max_id
+
+    async def _get_fallback(self):
+        if not self._fallback_pool:
+            mes = await self.client.get_messages(entity, limit=self.fallback_limit)
+            self._fallback_pool = [msg for msg in mes if msg.media]
+        return random.choice(self._fallback_pool) if self._fallback_pool else None
+
+    async def _pick_random(self):
+        if self._pool:
+            return random.choice(self._pool)
+        max_id = await self._learn_id_range()
+        if max_id:
+            for _ in range(self.max_attempts):
+                msg = await self.client.get_messages(entity, ids=random.randint(1, max_id))
+                if msg and msg.media:
+                    return msg
+        return await self._get_fallback()
+
+    async def _refetch(self, msg):
+        fresh = await self.client.get_messages(entity, ids=msg.id)
+        for pool in (self._pool, self._fallback_pool):
+            index = next((i for i, m in enumerate(pool) if m.id == msg.id), None)
+            if index is None:
+                continue
+            if fresh and fresh.media:
+                pool[index] = fresh
+            else:
+                del pool[index]
+        return fresh if fresh and fresh.media else None
+
+    async def _send(self, message, msg):
+        return await message.client.send_message(
+            message.peer_id,
+            message=msg,
+            reply_to=getattr(message, "reply_to_msg_id", None)
+        )
+
     @loader.command(
     en_doc="Sends a random husband",
     ru_doc="Отправляет рандомного аниме бойчика",
@@ -38,19 +131,24 @@ class Boys(loader.Module):
 
     async def rboy(self, message):
         """Отправляет рандомного аниме бойчика"""
-        send = await utils.answer(message, self.strings("sending"))
+        send = None
+        if not self._pool:
+            send = await utils.answer(message, self.strings("sending"))
     
         try:
-            mes = await self.client.get_messages(entity, limit=2500)
+            rndm_mes = await self._pick_random()
         except Exception:
             return await utils.answer(message, self.strings("error")), logger.error("An error! Probably, link:" f"{link}")
-	        
-        rndm_mes = random.choice(mes)
-        await message.client.send_message(
-        message.peer_id,
-        message=rndm_mes,
-        reply_to=getattr(message, "reply_to_msg_id", None)
-    )
-		
-        time.sleep(0.2)
-        await self.client.delete_messages(message.chat_id, send)
+
+        if not rndm_mes:
+            return await utils.answer(message, self.strings("error")), logger.error("No media found in:" f"{link}")
+
+        try:
+            await self._send(message, rndm_mes)
+        except FileReferenceExpiredError:
+            rndm_mes = await self._refetch(rndm_mes)
+            if not rndm_mes:
+                return await utils.answer(message, self.strings("error")), logger.error("Picked media was deleted from:" f"{link}")
+            await self._send(message, rndm_mes)
+
+        await self.client.delete_messages(message.chat_id, send or message)
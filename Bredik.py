@@ -18,8 +18,18 @@ from herokutl.types import Message
 from .. import loader, utils
 import random
 import logging
+import os
+import re
+import sqlite3
+import sys
 import time
-from typing import List, Optional
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+TOKEN_RE = re.compile(r"\w+")
+BEGIN, END = 0, 1
 
 logger = logging.getLogger(__name__)
 
@@ -27,20 +37,218 @@ logger = logging.getLogger(__name__)
 class BredMod(loader.Module):
     """Отправь рандомный бред от упоротой нейросети."""
     
-    strings = {"name": "Бредик"}
+    strings = {
+        "name": "Бредик",
+        "model_info": (
+            "🧠 <b>Модель бреда</b>\n\n"
+            "Текстов в корпусе: <code>{}</code>\n"
+            "Слов в словаре: <code>{}</code>\n"
+            "Состояний: <code>{}</code>\n"
+            "Переходов: <code>{}</code>\n"
+            "Время обучения: <code>{:.3f}</code> с\n"
+            "Память: <code>{:.1f}</code> КБ"
+        ),
+    }
 
     def __init__(self):
-        self._messages_cache: Optional[List[Message]] = None
+        self._messages_cache: List[str] = []
+        self._index_by_id: Dict[int, int] = {}
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        self._lengths: List[int] = []
+        self._length_order: List[int] = []
+        self._words: List[str] = ["", ""]
+        self._word_ids: Dict[str, int] = {}
+        self._transitions: Dict[Tuple[int, int], array] = {}
+        self._model_build_time: float = 0
+        self._last_id: int = 0
         self._cache_time: float = 0
+        self._conn: Optional[sqlite3.Connection] = None
         self.source_channel = "https://t.me/neuralmachine"
+        self.store_name = "bredik_corpus.db"
+        self.store_path: Optional[str] = None
         self.cache_ttl = 3600
         self.messages_limit = 600
+        self.edit_window = 100
+        self.short_length = 80
+        self.long_length = 300
+        self.gen_max_words = 40
+        self.length_filters = {
+            "short": "short",
+            "короткий": "short",
+            "long": "long",
+            "длинный": "long",
+        }
 
     async def client_ready(self, client, db):
         self.client = client
         self._db = db
+        self.store_path = os.path.join(os.path.dirname(utils.get_base_dir()), self.store_name)
+        self._open_store()
+
+    async def on_unload(self):
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    def _open_store(self):
+        self._conn = sqlite3.connect(self.store_path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS corpus ("
+            "id INTEGER PRIMARY KEY, text TEXT NOT NULL)"
+        )
+        for msg_id, text in self._conn.execute("SELECT id, text FROM corpus ORDER BY id"):
+            self._put(msg_id, text)
+        logger.info(f"Loaded {len(self._messages_cache)} texts from {self.store_path}")
+        self._log_model()
+
+    def _put(self, msg_id: int, text: str) -> bool:
+        index = self._index_by_id.get(msg_id)
+        if index is not None:
+            if self._messages_cache[index] == text:
+                return False
+            self._unindex(index, self._messages_cache[index])
+            self._untrain(self._messages_cache[index])
+            self._messages_cache[index] = text
+            self._index(index, text)
+            self._train(text)
+            return True
+        index = len(self._messages_cache)
+        self._index_by_id[msg_id] = index
+        self._messages_cache.append(text)
+        self._index(index, text)
+        self._train(text)
+        self._last_id = max(self._last_id, msg_id)
+        return True
+
+    def _word_id(self, word: str) -> int:
+        word_id = self._word_ids.get(word)
+        if word_id is None:
+            word_id = len(self._words)
+            self._word_ids[word] = word_id
+            self._words.append(word)
+        return word_id
+
+    def _train(self, text: str):
+        started = time.perf_counter()
+        prev2, prev1 = BEGIN, BEGIN
+        for word_id in [self._word_id(word) for word in text.split()] + [END]:
+            state = (prev2, prev1)
+            if state not in self._transitions:
+                self._transitions[state] = array("I")
+            self._transitions[state].append(word_id)
+            prev2, prev1 = prev1, word_id
+        self._model_build_time += time.perf_counter() - started
+
+    def _untrain(self, text: str):
+        prev2, prev1 = BEGIN, BEGIN
+        for word_id in [self._word_ids[word] for word in text.split()] + [END]:
+            state = (prev2, prev1)
+            choices = self._transitions.get(state)
+            if choices is not None and word_id in choices:
+                choices.remove(word_id)
+                if not choices:
+                    del self._transitions[state]
+            prev2, prev1 = prev1, word_id
+
+    def _generate(self) -> Optional[str]:
+        words = []
+        prev2, prev1 = BEGIN, BEGIN
+        while len(words) < self.gen_max_words:
+            choices = self._transitions.get((prev2, prev1))
+            if not choices:
+                break
+            word_id = random.choice(choices)
+            if word_id == END:
+                break
+            words.append(self._words[word_id])
+            prev2, prev1 = prev1, word_id
+        return " ".join(words) or None
+
+    def _model_stats(self) -> Tuple[int, int, int, float]:
+        size = sys.getsizeof(self._transitions) + sys.getsizeof(self._words) + sys.getsizeof(self._word_ids)
+        size += sum(sys.getsizeof(state) + sys.getsizeof(choices) for state, choices in self._transitions.items())
+        size += sum(sys.getsizeof(word) for word in self._words)
+        transitions = sum(len(choices) for choices in self._transitions.values())
+        return len(self._words) - 2, len(self._transitions), transitions, size / 1024
+
+    def _log_model(self):
+        words, states, transitions, size_kb = self._model_stats()
+        logger.info(
+            f"Markov model: {words} words, {states} states, {transitions} transitions, "
+            f"built in {self._model_build_time:.3f}s, {size_kb:.1f} KB"
+        )
+
+    def _index(self, index: int, text: str):
+        for token in set(TOKEN_RE.findall(text.lower())):
+            self._postings[token].append(index)
+        pos = bisect_right(self._lengths, len(text))
+        self._lengths.insert(pos, len(text))
+        self._length_order.insert(pos, index)
+
+    def _unindex(self, index: int, text: str):
+        for token in set(TOKEN_RE.findall(text.lower())):
+            postings = self._postings.get(token)
+            if postings and index in postings:
+                postings.remove(index)
+                if not postings:
+                    del self._postings[token]
+        lo = bisect_left(self._lengths, len(text))
+        hi = bisect_right(self._lengths, len(text))
+        pos = self._length_order.index(index, lo, hi)
+        del self._lengths[pos]
+        del self._length_order[pos]
+
+    def _search(self, query: str) -> Optional[str]:
+        length_filter = self.length_filters.get(query.lower())
+        if length_filter == "short":
+            end = bisect_right(self._lengths, self.short_length)
+            if not end:
+                return None
+            return self._messages_cache[self._length_order[random.randrange(end)]]
+        if length_filter == "long":
+            start = bisect_left(self._lengths, self.long_length)
+            if start >= len(self._lengths):
+                return None
+            return self._messages_cache[self._length_order[random.randrange(start, len(self._lengths))]]
+
+        tokens = TOKEN_RE.findall(query.lower())
+        if not tokens:
+            return None
+        postings = sorted((self._postings.get(token, []) for token in tokens), key=len)
+        candidates = postings[0]
+        if len(postings) > 1:
+            common = set(candidates).intersection(*postings[1:])
+            candidates = [index for index in candidates if index in common]
+        if not candidates:
+            return None
+        return self._messages_cache[random.choice(candidates)]
+
+    async def _sync(self):
+        if self._last_id:
+            messages = await self.client.get_messages(
+                self.source_channel,
+                limit=None,
+                min_id=max(self._last_id - self.edit_window, 0)
+            )
+        else:
+            messages = await self.client.get_messages(
+                self.source_channel,
+                limit=self.messages_limit
+            )
+
+        changed = []
+        for msg in sorted(messages, key=lambda m: m.id):
+            if not msg.media and msg.text and self._put(msg.id, msg.text):
+                changed.append((msg.id, msg.text))
+
+        if changed and self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO corpus (id, text) VALUES (?, ?)", changed)
+            self._conn.commit()
+        logger.info(f"Synced {len(changed)} new or edited texts, corpus size {len(self._messages_cache)}")
+        if changed:
+            self._log_model()
 
-    async def _get_messages(self) -> List[Message]:
+    async def _get_messages(self) -> List[str]:
         current_time = time.time()
         
         if (self._messages_cache and 
@@ -48,42 +256,63 @@ class BredMod(loader.Module):
             return self._messages_cache
         
         try:
-            messages = await self.client.get_messages(
-                self.source_channel,
-                limit=self.messages_limit
-            )
-            
-            filtered_messages = [msg for msg in messages if not msg.media]
-            
-            self._messages_cache = filtered_messages
+            await self._sync()
             self._cache_time = current_time
-            
-            return filtered_messages
-            
         except Exception as e:
             logger.error(f"Error loading messages: {e}")
-            return self._messages_cache or []
+
+        return self._messages_cache
 
     @loader.command(
-        ru_doc="отправить бред",
+        ru_doc="[слово | short | long | gen] - отправить бред",
         alias="бред"
     ) 
     async def bred(self, message: Message):
         try:
+            query = utils.get_args_raw(message).strip()
             await message.delete()
-            
-            messages = await self._get_messages()
-            
-            if not messages:
-                return
 
-            selected_message = random.choice(messages)
+            if query.lower() == "gen" and self._transitions:
+                selected_text = self._generate()
+            else:
+                messages = await self._get_messages()
+
+                if not messages:
+                    return
+
+                if query.lower() == "gen":
+                    selected_text = self._generate()
+                elif query:
+                    selected_text = self._search(query)
+                else:
+                    selected_text = random.choice(messages)
+
+            if not selected_text:
+                logger.info(f"No bred found for query {query!r}")
+                return
             
             await self.client.send_message(
                 message.peer_id,
-                message=selected_message.text,
+                message=selected_text,
                 reply_to=getattr(message, "reply_to_msg_id", None)
             )
                 
         except Exception as e:
             logger.error(f"Error sending bred: {e}")
+
+    @loader.command(
+        ru_doc="показать статистику модели бреда",
+    )
+    async def bredinfo(self, message: Message):
+        words, states, transitions, size_kb = self._model_stats()
+        await utils.answer(
+            message,
+            self.strings("model_info").format(
+                len(self._messages_cache),
+                words,
+                states,
+                transitions,
+                self._model_build_time,
+                size_kb,
+            ),
+        )
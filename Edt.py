@@ -4,15 +4,133 @@ __version__ = (1, 3, 1)
 
 from herokutl.types import Message
 from .. import loader, utils
-from ..inline.types import InlineCall
+from ..inline.types import InlineCall, InlineQuery
+from telethon.errors import (
+    ChannelInvalidError,
+    ChannelPrivateError,
+    FileReferenceExpiredError,
+    FloodWaitError,
+    InviteHashExpiredError,
+    InviteHashInvalidError,
+    UsernameInvalidError,
+    UsernameNotOccupiedError,
+)
+from telethon.tl.types import (
+    Document,
+    DocumentAttributeAnimated,
+    DocumentAttributeVideo,
+    InputDocument,
+    InputPhoto,
+)
+from telethon.utils import pack_bot_file_id
+from aiogram.types import (
+    InlineQueryResultArticle,
+    InlineQueryResultCachedDocument,
+    InlineQueryResultCachedMpeg4Gif,
+    InlineQueryResultCachedVideo,
+    InputTextMessageContent,
+)
 import random
 import asyncio
+import heapq
 import logging
+import sys
 import time
-from typing import List
+from collections import deque
+from typing import Deque, Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
+PERMANENT_ERRORS = (
+    ChannelInvalidError,
+    ChannelPrivateError,
+    InviteHashExpiredError,
+    InviteHashInvalidError,
+    UsernameInvalidError,
+    UsernameNotOccupiedError,
+    ValueError,
+)
+
+
+class MediaRef:
+    __slots__ = ("peer", "msg_id", "media_id", "access_hash", "file_reference", "dc_id", "kind")
+
+    def __init__(self, peer: int, msg_id: int, media_id: int, access_hash: int, file_reference: bytes, dc_id: int, kind: str):
+        self.peer = peer
+        self.msg_id = msg_id
+        self.media_id = media_id
+        self.access_hash = access_hash
+        self.file_reference = file_reference
+        self.dc_id = dc_id
+        self.kind = kind
+
+    @classmethod
+    def from_message(cls, msg: Message) -> Optional["MediaRef"]:
+        media = getattr(msg.media, "document", None)
+        if media is not None:
+            kind = "document"
+            for attribute in getattr(media, "attributes", []):
+                if isinstance(attribute, DocumentAttributeAnimated):
+                    kind = "gif"
+                    break
+                if isinstance(attribute, DocumentAttributeVideo):
+                    kind = "video"
+        else:
+            media = getattr(msg.media, "photo", None)
+            kind = "photo"
+        if media is None or not hasattr(media, "access_hash"):
+            return None
+        return cls(msg.chat_id, msg.id, media.id, media.access_hash, media.file_reference, media.dc_id, kind)
+
+    def to_input_media(self):
+        if self.kind == "photo":
+            return InputPhoto(self.media_id, self.access_hash, self.file_reference)
+        return InputDocument(self.media_id, self.access_hash, self.file_reference)
+
+    def to_bot_file_id(self) -> Optional[str]:
+        if self.kind == "photo":
+            return None
+        attributes = {
+            "gif": [DocumentAttributeAnimated()],
+            "video": [DocumentAttributeVideo(duration=0, w=0, h=0)],
+        }.get(self.kind, [])
+        return pack_bot_file_id(Document(
+            id=self.media_id,
+            access_hash=self.access_hash,
+            file_reference=self.file_reference,
+            date=None,
+            mime_type="",
+            size=0,
+            dc_id=self.dc_id,
+            attributes=attributes,
+        ))
+
+
+def deep_sizeof(obj, seen=None) -> int:
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += sum(
+            deep_sizeof(value, seen)
+            for key, value in vars(obj).items()
+            if key != "_client"
+        )
+    elif hasattr(type(obj), "__slots__"):
+        size += sum(
+            deep_sizeof(getattr(obj, key), seen)
+            for key in type(obj).__slots__
+            if hasattr(obj, key)
+        )
+    return size
+
 @loader.tds
 class MindfulEdit(loader.Module):
     strings = {
@@ -25,6 +143,21 @@ class MindfulEdit(loader.Module):
         "btn_close": "❌ Close",
         "cfg_show_inline_desc": "Show inline message with buttons after sending an edit",
         "cfg_channels_desc": "Specify a channel to add to the edit selection via @ (limit 19 channels)",
+        "cfg_fetch_concurrency_desc": "How many channels can be fetched at the same time",
+        "cfg_channel_weights_desc": "Per-channel weight multipliers in the form @channel=2 (default 1, proportional to pool size)",
+        "cache_stats": "📊 <b>Edit cache</b>\n\nHits: <code>{}</code>\nMisses: <code>{}</code>\nStale serves: <code>{}</code>\n\n{}",
+        "cache_channel": "• {}: <code>{}</code> videos, snapshot {} ago{}",
+        "cache_channel_error": ", last error {} ago",
+        "cache_memory": "\n\nMemory: <code>{:.1f}</code> KB for <code>{}</code> refs (~<code>{}</code> B each, full message ~<code>{}</code> B)",
+        "cache_dedup": "\nUnique videos: <code>{}</code> of <code>{}</code> fetched (dedup ratio <code>{:.1%}</code>)",
+        "cache_retry_latency": "\nTap-to-video latency: <code>{:.0f}</code> ms (last {} retries)",
+        "health_header": "🩺 <b>Channel health</b>\n\n{}",
+        "health_channel": "• {}: {}, last success: {}, <code>{}</code> videos",
+        "health_ago": "{} ago",
+        "health_ok": "✅ ok",
+        "health_transient": "⏳ failing ({} in a row), next try in {}",
+        "health_permanent": "💀 unavailable, next try in {}",
+        "health_never": "never",
     }
     
     strings_ru = {
@@ -36,6 +169,21 @@ class MindfulEdit(loader.Module):
         "btn_close": "❌ Закрыть",
         "cfg_show_inline_desc": "Показывать инлайн-сообщение с кнопками после отправки эдита",
         "cfg_channels_desc": "Укажите канал, который хотите добавить в подборку эдитов через @ (лимит 19 каналов)",
+        "cfg_fetch_concurrency_desc": "Сколько каналов можно загружать одновременно",
+        "cfg_channel_weights_desc": "Множители веса каналов в виде @channel=2 (по умолчанию 1, пропорционально размеру пула)",
+        "cache_stats": "📊 <b>Кэш эдитов</b>\n\nПопаданий: <code>{}</code>\nПромахов: <code>{}</code>\nУстаревших выдач: <code>{}</code>\n\n{}",
+        "cache_channel": "• {}: <code>{}</code> видео, снимок {} назад{}",
+        "cache_channel_error": ", последняя ошибка {} назад",
+        "cache_memory": "\n\nПамять: <code>{:.1f}</code> КБ на <code>{}</code> ссылок (~<code>{}</code> Б каждая, полное сообщение ~<code>{}</code> Б)",
+        "cache_dedup": "\nУникальных видео: <code>{}</code> из <code>{}</code> загруженных (доля дублей <code>{:.1%}</code>)",
+        "cache_retry_latency": "\nЗадержка от нажатия до видео: <code>{:.0f}</code> мс (последние {} повторов)",
+        "health_header": "🩺 <b>Состояние каналов</b>\n\n{}",
+        "health_channel": "• {}: {}, последний успех: {}, <code>{}</code> видео",
+        "health_ago": "{} назад",
+        "health_ok": "✅ ок",
+        "health_transient": "⏳ ошибки ({} подряд), следующая попытка через {}",
+        "health_permanent": "💀 недоступен, следующая попытка через {}",
+        "health_never": "никогда",
     }
 
     def __init__(self):
@@ -56,54 +204,298 @@ class MindfulEdit(loader.Module):
                 True,
                 lambda: self.strings["cfg_show_inline_desc"],
                 validator=loader.validators.Boolean()
+            ),
+            loader.ConfigValue(
+                "fetch_concurrency",
+                4,
+                lambda: self.strings["cfg_fetch_concurrency_desc"],
+                validator=loader.validators.Integer(minimum=1, maximum=20)
+            ),
+            loader.ConfigValue(
+                "channel_weights",
+                [],
+                lambda: self.strings["cfg_channel_weights_desc"],
+                validator=loader.validators.Series(
+                    validator=loader.validators.RegExp(r"^\S+=\d+(\.\d+)?$")
+                )
             )
         )
         self._videos_cache = {}
         self._cache_time = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._fetch_errors: Dict[str, float] = {}
+        self._channel_health: Dict[str, dict] = {}
+        self._cache_stats = {"hit": 0, "miss": 0, "stale": 0}
+        self._message_size_sample = 0
+        self._alias_channels: List[str] = []
+        self._alias_prob: List[float] = []
+        self._alias_index: List[int] = []
+        self._alias_dirty = True
+        self._alias_config = None
+        self._media_owner: Dict[int, str] = {}
+        self._fetched_counts: Dict[str, int] = {}
+        self._prefetched: Dict[int, Deque[MediaRef]] = {}
+        self._retry_latencies: Deque[float] = deque(maxlen=50)
+        self._fetch_semaphore = None
+        self._fetch_semaphore_size = 0
+        self._flood_waiting = set()
+        self._refresh_task = None
         self.main_channel = "https://t.me/MindfulEdit"
         self.cache_ttl = 3600
         self.messages_limit = 1000
+        self.flood_retries = 2
+        self.prefetch_size = 2
+        self.backoff_base = 60
+        self.backoff_max = 6 * 3600
+        self.permanent_backoff = 24 * 3600
+        self.inline_page_size = 20
+        self.inline_max_results = 200
+        self.inline_cache_time = 30
+        self.inline_probe_interval = 3600
+        self._inline_file_ids_retry_at = 0.0
 
     async def client_ready(self, client, db):
         self.client = client
         self._db = db
+        self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def on_unload(self):
+        tasks = [self._refresh_task, *self._inflight.values()]
+        for task in tasks:
+            if task:
+                task.cancel()
+        for task in tasks:
+            if task:
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
 
     def _get_all_channels(self) -> List[str]:
         channels = [self.main_channel]
         if self.config["additional_channels"]:
-            additional_channels = []
-            for channel in self.config["additional_channels"]:
-                if channel.startswith("@"):
-                    additional_channels.append(f"https://t.me/{channel[1:]}")
-                else:
-                    additional_channels.append(channel)
-            channels.extend(additional_channels)
+            channels.extend(map(self._normalize_channel, self.config["additional_channels"]))
         return channels
 
-    async def _get_videos(self, channel: str) -> List[Message]:
-        current_time = time.time()
-        if (channel in self._videos_cache and 
-            channel in self._cache_time and
-            current_time - self._cache_time[channel] < self.cache_ttl):
-            return self._videos_cache[channel]
-        
+    @staticmethod
+    def _normalize_channel(channel: str) -> str:
+        if channel.startswith("@"):
+            return f"https://t.me/{channel[1:]}"
+        return channel
+
+    def _channel_weights(self) -> Dict[str, float]:
+        weights = {}
+        for entry in self.config["channel_weights"]:
+            channel, weight = entry.rsplit("=", 1)
+            weights[self._normalize_channel(channel)] = float(weight)
+        return weights
+
+    def _build_alias_table(self):
+        weights = self._channel_weights()
+        channels = []
+        sizes = []
+        for channel in self._get_all_channels():
+            weight = len(self._videos_cache.get(channel, [])) * weights.get(channel, 1.0)
+            if weight > 0:
+                channels.append(channel)
+                sizes.append(weight)
+
+        count = len(channels)
+        total = sum(sizes)
+        scaled = [size * count / total for size in sizes]
+        prob = [1.0] * count
+        alias = list(range(count))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            prob[less] = scaled[less]
+            alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+
+        self._alias_channels = channels
+        self._alias_prob = prob
+        self._alias_index = alias
+        self._alias_dirty = False
+
+    def _sample_channel(self) -> Optional[str]:
+        config = (tuple(self.config["additional_channels"]), tuple(self.config["channel_weights"]))
+        if self._alias_dirty or config != self._alias_config:
+            self._alias_config = config
+            self._build_alias_table()
+        if not self._alias_channels:
+            return None
+        i = random.randrange(len(self._alias_channels))
+        if random.random() >= self._alias_prob[i]:
+            i = self._alias_index[i]
+        return self._alias_channels[i]
+
+    def _is_fresh(self, channel: str) -> bool:
+        return (channel in self._videos_cache and
+                channel in self._cache_time and
+                time.time() - self._cache_time[channel] < self.cache_ttl)
+
+    def _is_backed_off(self, channel: str) -> bool:
+        health = self._channel_health.get(channel)
+        return bool(health) and time.time() < health["retry_at"]
+
+    def _record_failure(self, channel: str, error: Exception):
+        now = time.time()
+        health = self._channel_health.setdefault(channel, {"failures": 0})
+        health["failures"] += 1
+        health["permanent"] = isinstance(error, PERMANENT_ERRORS)
+        if health["permanent"]:
+            delay = self.permanent_backoff
+        else:
+            delay = min(self.backoff_base * 2 ** (health["failures"] - 1), self.backoff_max)
+            if isinstance(error, FloodWaitError):
+                delay = max(delay, error.seconds)
+        health["retry_at"] = now + delay
+        self._fetch_errors[channel] = now
+        kind = "permanent" if health["permanent"] else "transient"
+        logger.error(f"Error loading videos from {channel} ({kind}, retry in {delay}s): {error}")
+
+    async def _fetch_videos(self, channel: str, wait_flood: bool = True) -> List[MediaRef]:
+        if self._is_backed_off(channel):
+            return self._videos_cache.get(channel, [])
+
         try:
-            videos = await self.client.get_messages(
-                channel,
-                limit=self.messages_limit
-            )
-            videos_with_media = [msg for msg in videos if msg.media]
-            if not videos_with_media:
-                logger.warning(f"No media found in channel {channel}")
-                return []
-            self._videos_cache[channel] = videos_with_media
-            self._cache_time[channel] = current_time
-            logger.info(f"Cache updated for {channel} with {len(videos_with_media)} videos")
-            return videos_with_media
+            videos = await self._fetch_messages(channel, wait_flood)
         except Exception as e:
-            logger.error(f"Error loading videos from {channel}: {e}")
+            self._record_failure(channel, e)
+            raise
+        self._channel_health.pop(channel, None)
+
+        refs = [ref for ref in map(MediaRef.from_message, videos) if ref]
+        if videos and not self._message_size_sample:
+            self._message_size_sample = deep_sizeof(videos[0])
+        if not refs:
+            logger.warning(f"No media found in channel {channel}")
+            return []
+        videos_with_media = self._dedup(channel, refs)
+        self._videos_cache[channel] = videos_with_media
+        self._cache_time[channel] = time.time()
+        self._alias_dirty = True
+        logger.info(f"Cache updated for {channel} with {len(videos_with_media)} unique of {len(refs)} videos")
+        return videos_with_media
+
+    def _dedup(self, channel: str, refs: List[MediaRef]) -> List[MediaRef]:
+        self._fetched_counts[channel] = len(refs)
+        channels = set(self._get_all_channels())
+        fetched = {ref.media_id for ref in refs}
+        for media_id, owner in list(self._media_owner.items()):
+            if owner == channel and media_id not in fetched:
+                del self._media_owner[media_id]
+
+        seen = set()
+        unique = []
+        for ref in refs:
+            if ref.media_id in seen:
+                continue
+            seen.add(ref.media_id)
+            owner = self._media_owner.get(ref.media_id)
+            if owner and owner != channel and owner in channels:
+                continue
+            self._media_owner[ref.media_id] = channel
+            unique.append(ref)
+        return unique
+
+    def _get_fetch_semaphore(self) -> asyncio.Semaphore:
+        size = self.config["fetch_concurrency"]
+        if self._fetch_semaphore is None or size != self._fetch_semaphore_size:
+            self._fetch_semaphore = asyncio.Semaphore(size)
+            self._fetch_semaphore_size = size
+        return self._fetch_semaphore
+
+    async def _fetch_messages(self, channel: str, wait_flood: bool = True) -> List[Message]:
+        attempts = self.flood_retries + 1 if wait_flood else 1
+        for attempt in range(attempts):
+            try:
+                async with self._get_fetch_semaphore():
+                    return await self.client.get_messages(
+                        channel,
+                        limit=self.messages_limit
+                    )
+            except FloodWaitError as e:
+                if attempt == attempts - 1:
+                    raise
+                logger.warning(f"FloodWait for {e.seconds} seconds on {channel}")
+                self._flood_waiting.add(channel)
+                try:
+                    await asyncio.sleep(e.seconds)
+                finally:
+                    self._flood_waiting.discard(channel)
+
+    def _schedule_fetch(self, channel: str, wait_flood: bool = True) -> asyncio.Task:
+        task = self._inflight.get(channel)
+        if task is None or task.done():
+            task = asyncio.create_task(self._fetch_videos(channel, wait_flood))
+            task.add_done_callback(self._consume_fetch_result)
+            self._inflight[channel] = task
+        return task
+
+    @staticmethod
+    def _consume_fetch_result(task: asyncio.Task):
+        if not task.cancelled():
+            task.exception()
+
+    def _peek_videos(self, channel: str) -> List[MediaRef]:
+        videos = self._videos_cache.get(channel)
+        if not videos:
+            return []
+        if self._is_fresh(channel):
+            self._cache_stats["hit"] += 1
+        else:
+            self._cache_stats["stale"] += 1
+            self._schedule_fetch(channel)
+        return videos
+
+    async def _get_videos(self, channel: str) -> List[MediaRef]:
+        videos = self._peek_videos(channel)
+        if videos:
+            return videos
+
+        self._cache_stats["miss"] += 1
+        if channel in self._flood_waiting:
+            return self._videos_cache.get(channel, [])
+        try:
+            return await self._schedule_fetch(channel, wait_flood=False)
+        except Exception:
             return self._videos_cache.get(channel, [])
 
+    async def _refresh_all(self):
+        channels = [channel for channel in self._get_all_channels() if not self._is_fresh(channel)]
+        if not channels:
+            return
+        started = time.time()
+        await asyncio.gather(
+            *(self._schedule_fetch(channel) for channel in channels),
+            return_exceptions=True
+        )
+        logger.info(f"Refreshed {len(channels)} channels in {time.time() - started:.1f}s")
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self._refresh_all()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error refreshing channels: {e}")
+            await asyncio.sleep(self.cache_ttl)
+
+    async def _send_ref(self, chat_id: int, ref: MediaRef, reply_to_msg_id: int = None):
+        try:
+            return await self.client.send_file(chat_id, ref.to_input_media(), reply_to=reply_to_msg_id)
+        except FileReferenceExpiredError:
+            msg = await self.client.get_messages(ref.peer, ids=ref.msg_id)
+            fresh = MediaRef.from_message(msg) if msg and msg.media else None
+            if not fresh:
+                raise
+            ref.file_reference = fresh.file_reference
+            return await self.client.send_file(chat_id, ref.to_input_media(), reply_to=reply_to_msg_id)
+
     async def _close_callback(self, call: InlineCall):
         try:
             await call.delete()
@@ -112,12 +504,66 @@ class MindfulEdit(loader.Module):
 
     async def _retry_callback(self, call: InlineCall):
         try:
-            await call.delete()
+            started = time.perf_counter()
             chat_id = call.form["chat"]
-            await self._send_random_edit_to_chat(chat_id)
+            next_video = self._pop_prefetched(chat_id)
+            if not next_video:
+                await call.delete()
+                await self._send_random_edit_to_chat(chat_id)
+                return
+
+            await self._send_ref(chat_id, next_video)
+            self._retry_latencies.append(time.perf_counter() - started)
+            await call.delete()
+            self._prefetch_next(chat_id, next_video)
+            await self._show_retry_form(chat_id)
         except Exception as e:
             logger.error(f"Error in retry callback: {e}")
 
+    async def _show_retry_form(self, message):
+        if not self.config["show_inline_after_send"]:
+            return
+
+        await asyncio.sleep(2)
+
+        await self.inline.form(
+            text=self.strings["inline_question"],
+            message=message,
+            reply_markup=[
+                [
+                    {"text": self.strings["btn_retry"], "callback": self._retry_callback},
+                    {"text": self.strings["btn_close"], "callback": self._close_callback}
+                ]
+            ]
+        )
+
+    def _pick_cached_video(self, count_stats: bool = True) -> Optional[MediaRef]:
+        channel = self._sample_channel()
+        if not channel:
+            return None
+        videos = self._peek_videos(channel) if count_stats else self._videos_cache.get(channel)
+        return random.choice(videos) if videos else None
+
+    def _prefetch_next(self, chat_id: int, current: MediaRef):
+        queue = self._prefetched.setdefault(chat_id, deque())
+        attempts = self.prefetch_size * 3
+        while len(queue) < self.prefetch_size and attempts:
+            attempts -= 1
+            candidate = self._pick_cached_video(count_stats=False)
+            if candidate is None:
+                break
+            if candidate is current or candidate in queue:
+                continue
+            queue.append(candidate)
+
+    def _pop_prefetched(self, chat_id: int) -> Optional[MediaRef]:
+        queue = self._prefetched.get(chat_id)
+        while queue:
+            candidate = queue.popleft()
+            if self._media_owner.get(candidate.media_id):
+                return candidate
+        return None
+
     async def _send_random_edit_to_chat(self, chat_id: int, reply_to_msg_id: int = None):
         try:
             status_msg = await self.client.send_message(
@@ -125,15 +571,11 @@ class MindfulEdit(loader.Module):
                 self.strings["sending"]
             )
             
-            channels = self._get_all_channels()
-            random.shuffle(channels)
-            selected_video = None
-            
-            for channel in channels:
-                videos = await self._get_videos(channel)
+            selected_video = self._pick_cached_video()
+            if not selected_video:
+                videos = await self._get_videos(random.choice(self._get_all_channels()))
                 if videos:
                     selected_video = random.choice(videos)
-                    break
             
             if not selected_video:
                 await status_msg.edit(self.strings["no_videos"])
@@ -144,25 +586,9 @@ class MindfulEdit(loader.Module):
             except Exception as e:
                 logger.warning(f"Could not delete status message: {e}")
             
-            await self.client.send_message(
-                chat_id,
-                message=selected_video,
-                reply_to=reply_to_msg_id
-            )
-            
-            if self.config["show_inline_after_send"]:
-                await asyncio.sleep(2)
-                
-                await self.inline.form(
-                    text=self.strings["inline_question"],
-                    message=status_msg,
-                    reply_markup=[
-                        [
-                            {"text": self.strings["btn_retry"], "callback": self._retry_callback},
-                            {"text": self.strings["btn_close"], "callback": self._close_callback}
-                        ]
-                    ]
-                )
+            await self._send_ref(chat_id, selected_video, reply_to_msg_id)
+            self._prefetch_next(chat_id, selected_video)
+            await self._show_retry_form(status_msg)
                     
         except Exception as e:
             logger.error(f"Error sending edit to chat: {e}")
@@ -180,3 +606,182 @@ class MindfulEdit(loader.Module):
     ) 
     async def redit(self, message: Message):
         await self._send_random_edit(message)
+
+    def _inline_result(self, ref: MediaRef):
+        file_id = ref.to_bot_file_id()
+        if not file_id:
+            return None
+        result_id = f"{ref.peer}_{ref.msg_id}"
+        if ref.kind == "video":
+            return InlineQueryResultCachedVideo(id=result_id, video_file_id=file_id, title=self.strings["name"])
+        if ref.kind == "gif":
+            return InlineQueryResultCachedMpeg4Gif(id=result_id, mpeg4_file_id=file_id)
+        return InlineQueryResultCachedDocument(id=result_id, document_file_id=file_id, title=self.strings["name"])
+
+    def _post_link(self, ref: MediaRef) -> Optional[str]:
+        channel = self._media_owner.get(ref.media_id, "")
+        if channel.startswith("https://t.me/") and "/+" not in channel and "/joinchat/" not in channel:
+            return f"{channel}/{ref.msg_id}"
+        return None
+
+    def _inline_link_result(self, ref: MediaRef):
+        link = self._post_link(ref)
+        return InlineQueryResultArticle(
+            id=f"{ref.peer}_{ref.msg_id}",
+            title=self.strings["name"],
+            description=link,
+            input_message_content=InputTextMessageContent(message_text=link),
+        )
+
+    def _inline_page(self, seed: int, offset: int, public_only: bool = False) -> List[MediaRef]:
+        rng = random.Random(seed)
+        weights = self._channel_weights()
+        keyed = []
+        for channel in self._get_all_channels():
+            weight = weights.get(channel, 1.0)
+            if weight <= 0:
+                continue
+            for ref in self._videos_cache.get(channel, []):
+                if ref.kind == "photo" or (public_only and not self._post_link(ref)):
+                    continue
+                keyed.append((rng.random() ** (1.0 / weight), ref))
+        ranked = heapq.nlargest(self.inline_max_results, keyed, key=lambda item: item[0])
+        return [ref for _, ref in ranked[offset:offset + self.inline_page_size]]
+
+    def _inline_next_offset(self, seed: int, offset: int, refs: List[MediaRef]) -> str:
+        end = offset + len(refs)
+        if len(refs) == self.inline_page_size and end < self.inline_max_results:
+            return f"{seed}:{end}"
+        return ""
+
+    @staticmethod
+    def _is_file_id_error(error: Exception) -> bool:
+        text = str(error).lower()
+        return "file identifier" in text or "file_id" in text
+
+    @loader.inline_handler(
+        en_doc="Random edits from the cached pool",
+        ru_doc="Рандомные эдиты из кэша",
+    )
+    async def edit_inline_handler(self, query: InlineQuery):
+        seed, _, offset = (query.offset or "").partition(":")
+        if seed.isdigit() and offset.isdigit():
+            seed, offset = int(seed), int(offset)
+        else:
+            seed, offset = random.getrandbits(32), 0
+
+        use_file_ids = time.time() >= self._inline_file_ids_retry_at
+        refs = self._inline_page(seed, offset, public_only=not use_file_ids)
+
+        if use_file_ids:
+            try:
+                await query.answer(
+                    [self._inline_result(ref) for ref in refs],
+                    cache_time=self.inline_cache_time,
+                    next_offset=self._inline_next_offset(seed, offset, refs),
+                )
+                return
+            except Exception as e:
+                if not self._is_file_id_error(e):
+                    logger.error(f"Error answering inline query: {e}")
+                    return
+                logger.warning(
+                    f"Inline bot rejected cached file ids, using post links for "
+                    f"{self._format_duration(self.inline_probe_interval)}: {e}"
+                )
+                self._inline_file_ids_retry_at = time.time() + self.inline_probe_interval
+                refs = self._inline_page(seed, offset, public_only=True)
+
+        try:
+            await query.answer(
+                [self._inline_link_result(ref) for ref in refs],
+                cache_time=self.inline_cache_time,
+                next_offset=self._inline_next_offset(seed, offset, refs),
+            )
+        except Exception as e:
+            logger.error(f"Error answering inline query: {e}")
+
+    @classmethod
+    def _format_age(cls, timestamp: float) -> str:
+        return cls._format_duration(time.time() - timestamp)
+
+    @staticmethod
+    def _format_duration(seconds: float) -> str:
+        seconds = max(int(seconds), 0)
+        if seconds < 60:
+            return f"{seconds}s"
+        if seconds < 3600:
+            return f"{seconds // 60}m"
+        return f"{seconds // 3600}h"
+
+    @loader.command(
+        en_doc="Show edit cache statistics",
+        ru_doc="Показать статистику кэша эдитов",
+    )
+    async def editcache(self, message: Message):
+        lines = []
+        for channel in self._get_all_channels():
+            error = ""
+            if self._fetch_errors.get(channel, 0) > self._cache_time.get(channel, 0):
+                error = self.strings["cache_channel_error"].format(self._format_age(self._fetch_errors[channel]))
+            snapshot = self._format_age(self._cache_time[channel]) if channel in self._cache_time else "—"
+            lines.append(self.strings["cache_channel"].format(
+                utils.escape_html(channel),
+                len(self._videos_cache.get(channel, [])),
+                snapshot,
+                error
+            ))
+        refs = [ref for videos in self._videos_cache.values() for ref in videos]
+        seen = set()
+        memory = sum(deep_sizeof(ref, seen) for ref in refs)
+        fetched = sum(self._fetched_counts.values())
+        await utils.answer(
+            message,
+            self.strings["cache_stats"].format(
+                self._cache_stats["hit"],
+                self._cache_stats["miss"],
+                self._cache_stats["stale"],
+                "\n".join(lines)
+            ) + self.strings["cache_memory"].format(
+                memory / 1024,
+                len(refs),
+                memory // len(refs) if refs else 0,
+                self._message_size_sample
+            ) + self.strings["cache_dedup"].format(
+                len(refs),
+                fetched,
+                1 - len(refs) / fetched if fetched else 0
+            ) + (self.strings["cache_retry_latency"].format(
+                sum(self._retry_latencies) / len(self._retry_latencies) * 1000,
+                len(self._retry_latencies)
+            ) if self._retry_latencies else "")
+        )
+
+    @loader.command(
+        en_doc="Show edit channels health",
+        ru_doc="Показать состояние каналов с эдитами",
+    )
+    async def edithealth(self, message: Message):
+        lines = []
+        for channel in self._get_all_channels():
+            health = self._channel_health.get(channel)
+            if not health:
+                state = self.strings["health_ok"]
+            elif health["permanent"]:
+                state = self.strings["health_permanent"].format(self._format_duration(health["retry_at"] - time.time()))
+            else:
+                state = self.strings["health_transient"].format(
+                    health["failures"],
+                    self._format_duration(health["retry_at"] - time.time())
+                )
+            if channel in self._cache_time:
+                last_success = self.strings["health_ago"].format(self._format_age(self._cache_time[channel]))
+            else:
+                last_success = self.strings["health_never"]
+            lines.append(self.strings["health_channel"].format(
+                utils.escape_html(channel),
+                state,
+                last_success,
+                len(self._videos_cache.get(channel, []))
+            ))
+        await utils.answer(message, self.strings["health_header"].format("\n".join(lines)))
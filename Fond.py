@@ -5,17 +5,162 @@ __version__ = (3, 0, 0)
 import random
 import logging
 import asyncio
+import re
 import time
-from collections import defaultdict
+from bisect import bisect_right
+from collections import deque
 from herokutl.types import Message
 from .. import loader, utils
-from telethon.errors import FloodWaitError
+from telethon.errors import (
+    ChannelInvalidError,
+    ChannelPrivateError,
+    FileReferenceExpiredError,
+    FloodWaitError,
+    PeerIdInvalidError,
+)
+from telethon.tl.types import (
+    DocumentAttributeAnimated,
+    DocumentAttributeVideo,
+    InputMessagesFilterGif,
+    InputMessagesFilterPhotos,
+    InputMessagesFilterVideo,
+    InputPeerChannel,
+)
 from ..inline.types import InlineCall
 
 logger = logging.getLogger(__name__)
 
 FOUNDATION_LINK = "https://t.me/+ZfmKdDrEMCA1NWEy"
 
+PEER_ERRORS = (ChannelInvalidError, ChannelPrivateError, PeerIdInvalidError)
+
+MEDIA_FILTERS = {
+    "photo": InputMessagesFilterPhotos,
+    "video": InputMessagesFilterVideo,
+    "gif": InputMessagesFilterGif,
+}
+
+TRIGGER_MODES = ("word:", "sub:")
+
+
+class SeenBitmap:
+    """One bit per pool item that a chat has already received"""
+
+    __slots__ = ("bits", "count", "last_used")
+
+    def __init__(self):
+        self.bits = bytearray()
+        self.count = 0
+        self.last_used = 0.0
+
+    def __contains__(self, index: int) -> bool:
+        byte = index >> 3
+        return byte < len(self.bits) and bool(self.bits[byte] & (1 << (index & 7)))
+
+    def add(self, index: int):
+        byte = index >> 3
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(byte + 1 - len(self.bits)))
+        if not self.bits[byte] & (1 << (index & 7)):
+            self.bits[byte] |= 1 << (index & 7)
+            self.count += 1
+
+    def discard(self, index: int):
+        byte = index >> 3
+        if byte < len(self.bits) and self.bits[byte] & (1 << (index & 7)):
+            self.bits[byte] &= ~(1 << (index & 7)) & 0xFF
+            self.count -= 1
+
+    def clear(self):
+        self.bits = bytearray()
+        self.count = 0
+
+    def first_unseen(self, size: int, start: int):
+        """Returns the first unseen index at or after start, wrapping around"""
+        total = (size + 7) >> 3
+        for offset in range(total + 1):
+            byte = ((start >> 3) + offset) % total
+            value = self.bits[byte] if byte < len(self.bits) else 0
+            if value == 0xFF:
+                continue
+            for bit in range(8):
+                index = (byte << 3) | bit
+                if index < size and not value & (1 << bit) and (offset or index >= start):
+                    return index
+        return None
+
+    def remap(self, mapping):
+        """Moves bits to new positions after items were removed from the pool"""
+        old = self.bits
+        self.clear()
+        for old_index, new_index in mapping.items():
+            if old_index >> 3 < len(old) and old[old_index >> 3] & (1 << (old_index & 7)):
+                self.add(new_index)
+
+
+DURATION_RE = re.compile(r"^(\d+)(?:s|с|sec|сек)$")
+SIZE_RE = re.compile(r"^(\d+(?:\.\d+)?)(?:mb|мб)$")
+
+
+class TriggerMatcher:
+    """Matches a chat's triggers against a message in one pass (Aho-Corasick)"""
+
+    def __init__(self, triggers: dict):
+        self.exact = {}
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for command, trigger in triggers.items():
+            mode = next((m for m in TRIGGER_MODES if trigger.startswith(m)), None)
+            if mode is None:
+                self.exact.setdefault(trigger, command)
+            elif trigger[len(mode):]:
+                self._add(trigger[len(mode):], command, mode == "word:")
+        self._build()
+
+    def _add(self, pattern: str, command: str, whole_word: bool):
+        node = 0
+        for char in pattern:
+            if char not in self.goto[node]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[node][char] = len(self.goto) - 1
+            node = self.goto[node][char]
+        self.output[node].append((len(pattern), command, whole_word))
+
+    def _build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    @staticmethod
+    def _is_boundary(text: str, index: int) -> bool:
+        return index < 0 or index >= len(text) or not (text[index].isalnum() or text[index] == "_")
+
+    def match(self, text: str):
+        command = self.exact.get(text)
+        if command or len(self.goto) == 1:
+            return command
+        node = 0
+        for end, char in enumerate(text):
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            for length, command, whole_word in self.output[node]:
+                if not whole_word or (
+                    self._is_boundary(text, end - length) and self._is_boundary(text, end + 1)
+                ):
+                    return command
+        return None
+
 @loader.tds
 class Foundation(loader.Module):
     strings = {
@@ -24,12 +169,14 @@ class Foundation(loader.Module):
         "not_joined": "<emoji document_id=6012681561286122335>🤤</emoji> You need to join the channel first: https://t.me/+ZfmKdDrEMCA1NWEy",
         "no_media": "<emoji document_id=6012681561286122335>🤤</emoji> No media found in channel",
         "no_videos": "<emoji document_id=6012681561286122335>🤤</emoji> No videos found in channel",
+        "no_videos_filtered": "<emoji document_id=6012681561286122335>🤤</emoji> No videos match these filters",
         "triggers_config": "⚙️ <b>Configuration of triggers for Foundation</b>\n\nChat: {} (ID: {})\n\nCurrent triggers:\n• <code>fond</code>: {}\n• <code>vfond</code>: {}",
         "select_trigger": "Select trigger to configure:",
-        "enter_trigger_word": "✍️ Enter trigger word (or 'off' to disable):",
+        "enter_trigger_word": "✍️ Enter trigger word (or 'off' to disable). Prefix with word: to match it as a word inside a message, or sub: to match any substring:",
         "trigger_updated": "✅ Trigger updated!\n\n{} will now trigger .{} in chat {}",
         "trigger_disabled": "✅ Trigger disabled for .{} in chat {}",
         "no_triggers": "No triggers configured",
+        "spam_stats": "📊 <b>Foundation rate limiter</b>\n\nTracked keys: <code>{}</code>\nBlocked now: <code>{}</code>\nBlocks in the last minute: <code>{}</code>",
     }
 
     strings_ru = {
@@ -37,25 +184,48 @@ class Foundation(loader.Module):
         "not_joined": "<emoji document_id=6012681561286122335>🤤</emoji> Нужно вступить в канал: https://t.me/+ZfmKdDrEMCA1NWEy",
         "no_media": "<emoji document_id=6012681561286122335>🤤</emoji> Не найдено медиа",
         "no_videos": "<emoji document_id=6012681561286122335>🤤</emoji> Не найдено видео",
+        "no_videos_filtered": "<emoji document_id=6012681561286122335>🤤</emoji> Нет видео под эти фильтры",
         "triggers_config": "⚙️ <b>Настройка триггеров для Foundation</b>\n\nЧат: {} (ID: {})\n\nТекущие триггеры:\n• <code>fond</code>: {}\n• <code>vfond</code>: {}",
         "select_trigger": "Выберите триггер для настройки:",
-        "enter_trigger_word": "✍️ Введите слово-триггер (или 'off' для отключения):",
+        "enter_trigger_word": "✍️ Введите слово-триггер (или 'off' для отключения). Добавьте word: чтобы искать его как слово внутри сообщения, или sub: для поиска любой подстроки:",
         "trigger_updated": "✅ Триггер обновлен!\n\n{} теперь будет вызывать .{} в чате {}",
         "trigger_disabled": "✅ Триггер отключен для .{} в чате {}",
         "no_triggers": "Триггеры не настроены",
+        "spam_stats": "📊 <b>Антиспам Foundation</b>\n\nОтслеживается ключей: <code>{}</code>\nЗаблокировано сейчас: <code>{}</code>\nБлокировок за минуту: <code>{}</code>",
     }
 
     def __init__(self):
-        self._media_cache = {}
-        self._video_cache = {}
-        self._cache_time = {}
+        self._pools = {}
+        self._max_ids = {}
+        self._video_durations = []
+        self._video_duration_order = []
+        self._video_sizes = []
+        self._video_size_order = []
+        self._cache_time = 0
+        self._sweep_task = None
+        self._refresh_task = None
         self.entity = None
-        self._last_entity_check = 0
         self.entity_check_interval = 300
         self.cache_ttl = 1200
-        self._spam_timestamps = defaultdict(list)
-        self._spam_blocked = defaultdict(float)
-        self._spam_lock = defaultdict(asyncio.Lock)
+        self.messages_limit = 2500
+        self.sweep_interval = 6 * 3600
+        self.sweep_chunk = 100
+        self.sweep_delay = 1.0
+        self.flood_retries = 2
+        self._matchers = {}
+        self._seen = {}
+        self._seen_last_evict = 0
+        self.seen_idle_ttl = 3600
+        self.seen_attempts = 8
+        self.album_max = 30
+        self.album_chunk = 10
+        self._spam_state = {}
+        self._spam_block_times = deque(maxlen=1000)
+        self._spam_last_evict = 0
+        self.spam_limit = 3
+        self.spam_period = 1.0
+        self.spam_block = 15.0
+        self.spam_idle_ttl = 60.0
 
         self.config = loader.ModuleConfig(
             loader.ConfigValue(
@@ -70,86 +240,359 @@ class Foundation(loader.Module):
         self.client = client
         self._db = db
         self.triggers = self._db.get(__name__, "triggers", {})
+        self._matchers = {
+            int(chat_id): TriggerMatcher(chat_triggers)
+            for chat_id, chat_triggers in self.triggers.items()
+            if chat_triggers
+        }
         await self._load_entity()
+        self._sweep_task = asyncio.create_task(self._sweep_loop())
+
+    async def on_unload(self):
+        tasks = [self._sweep_task, self._refresh_task]
+        for task in tasks:
+            if task:
+                task.cancel()
+        for task in tasks:
+            if task:
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
 
     async def _load_entity(self):
-        current_time = time.time()
-        if (self.entity and 
-            current_time - self._last_entity_check < self.entity_check_interval):
+        if self.entity:
             return True
-        try:
-            self.entity = await self.client.get_entity(FOUNDATION_LINK)
-            self._last_entity_check = current_time
+        state = self._db.get(__name__, "entity", {})
+        if state.get("joined"):
+            self.entity = InputPeerChannel(state["id"], state["access_hash"])
             return True
+        if time.time() - state.get("checked", 0) < self.entity_check_interval:
+            return False
+        try:
+            entity = await self.client.get_entity(FOUNDATION_LINK)
         except Exception as e:
             logger.warning(f"Could not load foundation entity: {e}")
-            self.entity = None
+            self._db.set(__name__, "entity", {"joined": False, "checked": time.time()})
             return False
+        self.entity = InputPeerChannel(entity.id, entity.access_hash)
+        self._db.set(__name__, "entity", {
+            "id": entity.id,
+            "access_hash": entity.access_hash,
+            "joined": True,
+            "checked": time.time(),
+        })
+        return True
+
+    def _invalidate_entity(self):
+        logger.info("Foundation entity rejected, resolving it again")
+        self.entity = None
+        self._db.set(__name__, "entity", {})
+
+    async def _refresh_pools(self):
+        new_messages = {}
+        fetched_bytes = 0
+        for media_type, media_filter in MEDIA_FILTERS.items():
+            if media_type in self._pools:
+                messages = await self.client.get_messages(
+                    self.entity,
+                    limit=None,
+                    min_id=self._max_ids.get(media_type, 0),
+                    filter=media_filter()
+                )
+            else:
+                messages = await self.client.get_messages(
+                    self.entity,
+                    limit=self.messages_limit,
+                    filter=media_filter()
+                )
+            new_messages[media_type] = sorted(messages, key=lambda msg: msg.id)
+            fetched_bytes += sum(len(bytes(msg)) for msg in messages)
+
+        any_pool = self._pools.setdefault("any", [])
+        for media_type, messages in new_messages.items():
+            self._pools.setdefault(media_type, []).extend(messages)
+            any_pool.extend(messages)
+            if messages:
+                self._max_ids[media_type] = max(self._max_ids.get(media_type, 0), messages[-1].id)
+        self._trim_pools()
+        self._build_video_index()
+        self._cache_time = time.time()
+        fetched = sum(len(messages) for messages in new_messages.values())
+        logger.info(
+            f"Foundation pools refreshed: fetched {fetched} messages, {fetched_bytes / 1024:.1f} KB "
+            f"({', '.join(f'{k}={len(v)}' for k, v in self._pools.items())})"
+        )
+
+    def _replace_messages(self, fresh):
+        """Swaps refetched messages into every pool in place, keeping seen indices valid"""
+        for pool in self._pools.values():
+            for index, msg in enumerate(pool):
+                replacement = fresh.get(msg.id)
+                if replacement is not None:
+                    pool[index] = replacement
+
+    async def _refetch(self, messages):
+        ids = [msg.id for msg in messages]
+        fetched = await self.client.get_messages(self.entity, ids=ids)
+        self._replace_messages({msg.id: msg for msg in fetched if msg is not None})
+        deleted = {msg_id for msg_id, msg in zip(ids, fetched) if msg is None}
+        if deleted:
+            self._remove_deleted(deleted)
+        return [msg for msg in fetched if msg is not None]
+
+    async def _send_fresh(self, send, messages):
+        try:
+            await send(messages)
+        except FileReferenceExpiredError:
+            fresh = await self._refetch(messages)
+            if not fresh:
+                raise
+            await send(fresh)
+
+    def _filter_pool(self, media_type, keep):
+        mapping = {}
+        kept = []
+        for index, msg in enumerate(self._pools[media_type]):
+            if keep(msg):
+                mapping[index] = len(kept)
+                kept.append(msg)
+        self._pools[media_type] = kept
+        for (_, seen_type), seen in self._seen.items():
+            if seen_type == media_type:
+                seen.remap(mapping)
+
+    def _remove_deleted(self, deleted_ids):
+        for media_type in self._pools:
+            self._filter_pool(media_type, lambda msg: msg.id not in deleted_ids)
+        self._build_video_index()
+
+    def _trim_pools(self):
+        """Drops the oldest messages so no pool grows past messages_limit"""
+        for media_type, pool in self._pools.items():
+            if len(pool) > self.messages_limit:
+                cutoff = sorted(msg.id for msg in pool)[len(pool) - self.messages_limit]
+                self._filter_pool(media_type, lambda msg: msg.id >= cutoff)
+
+    def _evict_idle_seen(self, now):
+        if now - self._seen_last_evict < 60:
+            return
+        self._seen_last_evict = now
+        for key in [key for key, seen in self._seen.items() if now - seen.last_used > self.seen_idle_ttl]:
+            del self._seen[key]
+
+    def _pick_unseen(self, chat_id, media_type, size, picker=None):
+        now = time.monotonic()
+        self._evict_idle_seen(now)
+        seen = self._seen.setdefault((chat_id, media_type), SeenBitmap())
+        seen.last_used = now
+        if seen.count >= size:
+            seen.clear()
+
+        index = None
+        for _ in range(self.seen_attempts):
+            index = picker() if picker else random.randrange(size)
+            if index is None or index not in seen:
+                break
+        else:
+            if not picker:
+                index = seen.first_unseen(size, random.randrange(size))
+
+        if index is not None:
+            seen.add(index)
+        return index
+
+    @staticmethod
+    def _video_meta(msg):
+        document = getattr(msg.media, "document", None)
+        if document is None:
+            return 0, 0
+        duration = next(
+            (attr.duration for attr in document.attributes if isinstance(attr, DocumentAttributeVideo)),
+            0
+        )
+        return duration, document.size
+
+    def _build_video_index(self):
+        meta = [self._video_meta(msg) for msg in self._pools.get("video", [])]
+        by_duration = sorted(range(len(meta)), key=lambda i: meta[i][0])
+        by_size = sorted(range(len(meta)), key=lambda i: meta[i][1])
+        self._video_durations = [meta[i][0] for i in by_duration]
+        self._video_duration_order = by_duration
+        self._video_sizes = [meta[i][1] for i in by_size]
+        self._video_size_order = by_size
+
+    def _pick_filtered_video(self, max_duration=None, max_size=None):
+        ranges = []
+        if max_duration is not None:
+            ranges.append((self._video_duration_order, bisect_right(self._video_durations, max_duration)))
+        if max_size is not None:
+            ranges.append((self._video_size_order, bisect_right(self._video_sizes, max_size)))
+        if len(ranges) == 1:
+            order, end = ranges[0]
+            return order[random.randrange(end)] if end else None
+        (first, first_end), (second, second_end) = sorted(ranges, key=lambda r: r[1])
+        allowed = set(second[:second_end])
+        indices = [i for i in first[:first_end] if i in allowed]
+        return random.choice(indices) if indices else None
+
+    @staticmethod
+    def _parse_count(args: str) -> int:
+        return next((int(token) for token in args.split() if token.isdigit()), 1)
+
+    @staticmethod
+    def _is_album_compatible(msg) -> bool:
+        document = getattr(msg.media, "document", None)
+        return document is None or not any(
+            isinstance(attr, DocumentAttributeAnimated) for attr in document.attributes
+        )
+
+    @staticmethod
+    def _parse_video_filters(args: str):
+        max_duration = max_size = None
+        for token in args.lower().split():
+            if match := DURATION_RE.match(token):
+                max_duration = int(match.group(1))
+            elif match := SIZE_RE.match(token):
+                max_size = int(float(match.group(1)) * 1024 * 1024)
+        return max_duration, max_size
+
+    async def _sweep_deleted(self):
+        ids = [msg.id for msg in self._pools.get("any", [])]
+        fresh = {}
+        deleted = set()
+        for start in range(0, len(ids), self.sweep_chunk):
+            chunk = ids[start:start + self.sweep_chunk]
+            messages = await self.client.get_messages(self.entity, ids=chunk)
+            for msg_id, msg in zip(chunk, messages):
+                if msg is None:
+                    deleted.add(msg_id)
+                else:
+                    fresh[msg_id] = msg
+            await asyncio.sleep(self.sweep_delay)
+        self._replace_messages(fresh)
+        if deleted:
+            self._remove_deleted(deleted)
+        logger.info(
+            f"Foundation sweep checked {len(ids)} messages, refreshed {len(fresh)}, removed {len(deleted)} deleted"
+        )
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                if self._pools and self.entity:
+                    await self._sweep_deleted()
+            except asyncio.CancelledError:
+                break
+            except PEER_ERRORS as e:
+                logger.warning(f"Foundation sweep failed: {e}")
+                self._invalidate_entity()
+            except Exception as e:
+                logger.warning(f"Foundation sweep failed: {e}")
+
+    async def _refresh_with_retry(self):
+        for attempt in range(self.flood_retries + 1):
+            if not await self._load_entity():
+                return False
+            try:
+                await self._refresh_pools()
+                return True
+            except FloodWaitError as e:
+                if attempt == self.flood_retries:
+                    raise
+                logger.warning(f"FloodWait for {e.seconds} seconds")
+                await asyncio.sleep(e.seconds)
+            except PEER_ERRORS:
+                if attempt == self.flood_retries:
+                    raise
+                self._invalidate_entity()
+            except ValueError as e:
+                if "Could not find the entity" in str(e):
+                    return False
+                raise e
 
     async def _get_cached_media(self, media_type="any"):
         current_time = time.time()
-        cache_key = media_type
-        if (cache_key in self._cache_time and 
-            current_time - self._cache_time[cache_key] < self.cache_ttl):
-            if cache_key == "any" and cache_key in self._media_cache:
-                return self._media_cache[cache_key]
-            elif cache_key == "video" and cache_key in self._video_cache:
-                return self._video_cache[cache_key]
-        if not await self._load_entity():
+        if (self._pools and
+            current_time - self._cache_time < self.cache_ttl):
+            return self._pools.get(media_type, [])
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._refresh_with_retry())
+        if not await asyncio.shield(self._refresh_task):
             return None
-        try:
-            messages = await self.client.get_messages(self.entity, limit=2500)
-        except FloodWaitError as e:
-            logger.warning(f"FloodWait for {e.seconds} seconds")
-            await asyncio.sleep(e.seconds)
-            return await self._get_cached_media(media_type)
-        except ValueError as e:
-            if "Could not find the entity" in str(e):
-                return None
-            raise e
-        if not messages:
-            return []
-        if media_type == "any":
-            media_messages = [msg for msg in messages if msg.media]
-            self._media_cache["any"] = media_messages
-        else:
-            video_messages = []
-            for msg in messages:
-                if msg.media and hasattr(msg.media, 'document'):
-                    attr = getattr(msg.media.document, 'mime_type', '')
-                    if 'video' in attr:
-                        video_messages.append(msg)
-            self._video_cache["video"] = video_messages
-        self._cache_time[cache_key] = current_time
-        return self._media_cache.get("any") if media_type == "any" else self._video_cache.get("video")
+        return self._pools.get(media_type, [])
+
+    def _evict_idle_spam_keys(self, now):
+        if now - self._spam_last_evict < self.spam_idle_ttl:
+            return
+        self._spam_last_evict = now
+        expired = [
+            key for key, (tat, blocked_until) in self._spam_state.items()
+            if max(tat, blocked_until) + self.spam_idle_ttl < now
+        ]
+        for key in expired:
+            del self._spam_state[key]
 
     async def _check_spam(self, user_id, chat_id):
-        key = f"{user_id}:{chat_id}"
-        now = time.time()
-        
-        async with self._spam_lock[key]:
-            if key in self._spam_blocked and now < self._spam_blocked[key]:
-                return True
-                
-            if key in self._spam_blocked and now >= self._spam_blocked[key]:
-                del self._spam_blocked[key]
-                if key in self._spam_timestamps:
-                    del self._spam_timestamps[key]
-            
-            timestamps = self._spam_timestamps[key]
-            one_sec_ago = now - 1.0
-            timestamps = [ts for ts in timestamps if ts > one_sec_ago]
-            
-            if len(timestamps) >= 3:
-                self._spam_blocked[key] = now + 15.0
-                self._spam_timestamps[key] = []
-                return True
-            
-            timestamps.append(now)
-            self._spam_timestamps[key] = timestamps[-10:]
+        now = time.monotonic()
+        self._evict_idle_spam_keys(now)
+        key = (user_id, chat_id)
+        tat, blocked_until = self._spam_state.get(key, (now, 0.0))
+
+        if now < blocked_until:
+            return True
+
+        interval = self.spam_period / self.spam_limit
+        tat = max(tat, now)
+        if tat - now > self.spam_period - interval:
+            self._spam_state[key] = (now, now + self.spam_block)
+            self._spam_block_times.append(now)
+            return True
+
+        self._spam_state[key] = (tat + interval, 0.0)
+        return False
+
+    async def _send_album(self, message: Message, media_type: str, media_list, picker, count: int):
+        chat_id = utils.get_chat_id(message)
+        count = min(count, self.album_max, len(media_list))
+        picked = {}
+        for _ in range(count * 4):
+            if len(picked) >= count:
+                break
+            index = self._pick_unseen(chat_id, media_type, len(media_list), picker)
+            if index is None:
+                break
+            if index in picked:
+                continue
+            if self._is_album_compatible(media_list[index]):
+                picked[index] = media_list[index]
+            else:
+                self._seen[(chat_id, media_type)].discard(index)
+        if not picked:
             return False
 
-    async def _send_media(self, message: Message, media_type: str = "any", delete_command: bool = False):
+        items = list(picked.values())
+        for start in range(0, len(items), self.album_chunk):
+            await self._send_fresh(
+                lambda chunk: self.client.send_file(
+                    message.peer_id,
+                    [msg.media for msg in chunk],
+                    reply_to=getattr(message, "reply_to_msg_id", None)
+                ),
+                items[start:start + self.album_chunk]
+            )
+        return True
+
+    async def _send_media(
+        self,
+        message: Message,
+        media_type: str = "any",
+        delete_command: bool = False,
+        max_duration=None,
+        max_size=None,
+        count: int = 1,
+    ):
         try:
             if not await self._load_entity():
                 return await utils.answer(message, self.strings["not_joined"])
@@ -157,18 +600,31 @@ class Foundation(loader.Module):
             if media_list is None:
                 await utils.answer(message, self.strings["not_joined"])
                 return
+            picker = None
+            if max_duration is not None or max_size is not None:
+                picker = lambda: self._pick_filtered_video(max_duration, max_size)
+            empty = "no_media" if media_type == "any" else "no_videos"
+            not_found = "no_videos_filtered" if picker else empty
             if not media_list:
-                if media_type == "any":
-                    await utils.answer(message, self.strings["no_media"])
-                else:
-                    await utils.answer(message, self.strings["no_videos"])
+                await utils.answer(message, self.strings[empty])
                 return
-            random_message = random.choice(media_list)
-            await self.client.send_message(
-                message.peer_id,
-                message=random_message,
-                reply_to=getattr(message, "reply_to_msg_id", None)
-            )
+            if count > 1:
+                if not await self._send_album(message, media_type, media_list, picker, count):
+                    await utils.answer(message, self.strings[not_found])
+                    return
+            else:
+                index = self._pick_unseen(utils.get_chat_id(message), media_type, len(media_list), picker)
+                if index is None:
+                    await utils.answer(message, self.strings[not_found])
+                    return
+                await self._send_fresh(
+                    lambda fresh: self.client.send_message(
+                        message.peer_id,
+                        message=fresh[0],
+                        reply_to=getattr(message, "reply_to_msg_id", None)
+                    ),
+                    [media_list[index]]
+                )
             if delete_command:
                 await asyncio.sleep(0.1)
                 try:
@@ -180,22 +636,47 @@ class Foundation(loader.Module):
             await utils.answer(message, self.strings["error"])
 
     @loader.command(
-        en_doc="Send NSFW media from Foundation",
-        ru_doc="Отправить NSFW медиа с Фонда",
+        en_doc="[count] - Send NSFW media from Foundation",
+        ru_doc="[количество] - Отправить NSFW медиа с Фонда",
     )
     async def fond(self, message: Message):
         if await self._check_spam(message.sender_id, utils.get_chat_id(message)):
             return
-        await self._send_media(message, "any", delete_command=True)
+        count = self._parse_count(utils.get_args_raw(message))
+        await self._send_media(message, "any", delete_command=True, count=count)
 
     @loader.command(
-        en_doc="Send NSFW video from Foundation",
-        ru_doc="Отправить NSFW видео с Фонда",
+        en_doc="[count] [<seconds>s] [<size>mb] - Send NSFW video from Foundation",
+        ru_doc="[количество] [<секунды>s] [<размер>mb] - Отправить NSFW видео с Фонда",
     )
     async def vfond(self, message: Message):
         if await self._check_spam(message.sender_id, utils.get_chat_id(message)):
             return
-        await self._send_media(message, "video", delete_command=True)
+        args = utils.get_args_raw(message)
+        max_duration, max_size = self._parse_video_filters(args)
+        await self._send_media(
+            message,
+            "video",
+            delete_command=True,
+            max_duration=max_duration,
+            max_size=max_size,
+            count=self._parse_count(args)
+        )
+
+    @loader.command(
+        en_doc="Show Foundation rate limiter stats",
+        ru_doc="Показать статистику антиспама Foundation",
+    )
+    async def fstats(self, message: Message):
+        now = time.monotonic()
+        await utils.answer(
+            message,
+            self.strings("spam_stats").format(
+                len(self._spam_state),
+                sum(1 for _, blocked_until in self._spam_state.values() if blocked_until > now),
+                sum(1 for blocked_at in self._spam_block_times if now - blocked_at < 60)
+            )
+        )
 
     @loader.command(
         en_doc="Configure triggers for fond/vfond commands",
@@ -274,6 +755,10 @@ class Foundation(loader.Module):
         else:
             self.triggers[str(chat_id)][command] = query
         self._db.set(__name__, "triggers", self.triggers)
+        if self.triggers.get(str(chat_id)):
+            self._matchers[int(chat_id)] = TriggerMatcher(self.triggers[str(chat_id)])
+        else:
+            self._matchers.pop(int(chat_id), None)
         try:
             chat = await self.client.get_entity(chat_id)
             chat_title = getattr(chat, "title", "Private Chat")
@@ -335,14 +820,12 @@ class Foundation(loader.Module):
     async def watcher(self, message: Message):
         if not self.config["triggers_enabled"]:
             return
-        if not message.text:
-            return
         chat_id = utils.get_chat_id(message)
-        text = message.text.lower().strip()
-        chat_triggers = self.triggers.get(str(chat_id), {})
-        for command, trigger in chat_triggers.items():
-            if text == trigger:
-                if await self._check_spam(message.sender_id, chat_id):
-                    return
-                await self._send_media(message, "video" if command == "vfond" else "any", delete_command=True)
-                break 
+        matcher = self._matchers.get(chat_id)
+        if matcher is None or not message.text:
+            return
+        command = matcher.match(message.text.lower().strip())
+        if command:
+            if await self._check_spam(message.sender_id, chat_id):
+                return
+            await self._send_media(message, "video" if command == "vfond" else "any", delete_command=True) 
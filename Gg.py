@@ -6,6 +6,11 @@ __version__ = (1, 0, 0)
 from herokutl.types import Message
 from .. import loader, utils
 import asyncio
+import copy
+import logging
+import time
+
+logger = logging.getLogger(__name__)
 
 @loader.tds
 class AliasProMod(loader.Module):
@@ -18,14 +23,59 @@ class AliasProMod(loader.Module):
 
     def __init__(self):
         self.aliases = {}
+        self._alias_trie = {}
+        self.config = loader.ModuleConfig(
+            loader.ConfigValue(
+                "direct_dispatch",
+                True,
+                "Вызывать команды напрямую через загрузчик, а не отправлять их сообщениями",
+                validator=loader.validators.Boolean()
+            ),
+            loader.ConfigValue(
+                "concurrency",
+                3,
+                "Сколько команд алиаса выполнять одновременно",
+                validator=loader.validators.Integer(minimum=1, maximum=10)
+            ),
+            loader.ConfigValue(
+                "command_timeout",
+                30,
+                "Сколько секунд ждать ответа каждой команды",
+                validator=loader.validators.Integer(minimum=1, maximum=300)
+            )
+        )
+        self.output_limit = 1000
+        self.summary_limit = 4096
 
     async def client_ready(self, client, db):
         self.client = client
         self._db = db
         self.aliases = self._db.get("AliasPro", "aliases", {})
+        self._build_alias_trie()
 
     def save_aliases(self):
         self._db.set("AliasPro", "aliases", self.aliases)
+        self._build_alias_trie()
+
+    def _build_alias_trie(self):
+        trie = {}
+        for alias in self.aliases:
+            node = trie
+            for char in alias:
+                node = node.setdefault(char, {})
+            node[None] = alias
+        self._alias_trie = trie
+
+    def _match_alias(self, text: str, start: int):
+        node = self._alias_trie
+        match = None
+        for char in text[start:]:
+            node = node.get(char)
+            if node is None:
+                break
+            if None in node:
+                match = node[None]
+        return match
 
     @loader.command(
         ru_doc="<название> <команды через запятую> [значение] - Добавить алиас для команд."
@@ -94,27 +144,134 @@ class AliasProMod(loader.Module):
             
         text = message.text.strip()
         prefix = self.get_prefix()
-        
-        for alias, data in self.aliases.items():
-            alias_with_prefix = prefix + alias
+
+        if not text or text[0] != prefix[0] or not text.startswith(prefix):
+            return
+
+        alias = self._match_alias(text, len(prefix))
+        if alias is None:
+            return
+
+        data = self.aliases[alias]
+        search_query = text[len(prefix) + len(alias):].strip()
+
+        if not self.config["direct_dispatch"]:
+            await message.delete()
+
+        full_commands = []
+        for command in data["commands"]:
+            if data["value"]:
+                full_command = f"{prefix}{command} {data['value']} {search_query}"
+            else:
+                full_command = f"{prefix}{command} {search_query}"
+            full_commands.append((command, full_command.strip()))
+
+        if self.config["direct_dispatch"]:
+            await self._dispatch_commands(message, full_commands)
+        else:
+            await self._send_commands(message, [full_command for _, full_command in full_commands])
+
+    async def _send_commands(self, message: Message, full_commands):
+        for i, full_command in enumerate(full_commands):
+            await self.client.send_message(
+                message.peer_id,
+                full_command
+            )
             
-            if text.startswith(alias_with_prefix):
-                search_query = text[len(alias_with_prefix):].strip()
-                
-                await message.delete()
-                
-                for i, command in enumerate(data["commands"]):
-                    if data["value"]:
-                        full_command = f"{prefix}{command} {data['value']} {search_query}"
-                    else:
-                        full_command = f"{prefix}{command} {search_query}"
-                    
-                    await self.client.send_message(
-                        message.peer_id,
-                        full_command.strip()
+            if i < len(full_commands) - 1:
+                await asyncio.sleep(3)
+
+    def _synthetic_message(self, message: Message, full_command: str, on_output) -> Message:
+        synthetic = copy.copy(message)
+        synthetic.raw_text = full_command
+
+        async def edit(text=None, *args, **kwargs):
+            if text is not None:
+                on_output(str(text))
+            return synthetic
+
+        async def delete(*args, **kwargs):
+            pass
+
+        synthetic.edit = edit
+        synthetic.delete = delete
+        return synthetic
+
+    @staticmethod
+    def _text_length(text: str) -> int:
+        """Length as Telegram counts it, in UTF-16 code units"""
+        return len(text.encode("utf-16-le")) // 2
+
+    def _format_output(self, output: str, limit: int) -> str:
+        if self._text_length(output) > limit:
+            output = output.encode("utf-16-le")[:2 * max(limit - 1, 0)].decode("utf-16-le", "ignore") + "…"
+        return utils.escape_html(output)
+
+    def _render_summary(self, full_commands, results) -> str:
+        blocks = []
+        outputs = []
+        used = 2 * (len(full_commands) - 1)
+        for (_, full_command), result in zip(full_commands, results):
+            header = f"<code>{utils.escape_html(full_command)}</code>"
+            if result is None:
+                blocks.append(f"⏳ {header}")
+                used += self._text_length(full_command) + 2
+                continue
+            status, elapsed, output = result
+            elapsed = f"{elapsed:.1f}s"
+            blocks.append(f"{status} {header} <i>{elapsed}</i>")
+            used += self._text_length(f"{status} {full_command} {elapsed}")
+            if output:
+                outputs.append((len(blocks) - 1, output))
+                used += 1
+
+        if outputs:
+            limit = min(self.output_limit, max(self.summary_limit - used, 0) // len(outputs))
+            for index, output in outputs:
+                blocks[index] += f"\n{self._format_output(output, limit)}"
+        return "\n\n".join(blocks)
+
+    async def _dispatch_commands(self, message: Message, full_commands):
+        semaphore = asyncio.Semaphore(self.config["concurrency"])
+        timeout = self.config["command_timeout"]
+        results = [None] * len(full_commands)
+        summary_lock = asyncio.Lock()
+
+        async def update_summary():
+            async with summary_lock:
+                try:
+                    await utils.answer(message, self._render_summary(full_commands, results))
+                except Exception as e:
+                    logger.warning(f"Could not update alias summary: {e}")
+
+        async def run(index: int, command: str, full_command: str):
+            _, handler = self.allmodules.dispatch(command)
+            started = time.perf_counter()
+            if handler is None:
+                await self._send_commands(message, [full_command])
+                results[index] = ("📤", time.perf_counter() - started, "")
+                return await update_summary()
+
+            outputs = []
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    await asyncio.wait_for(
+                        handler(self._synthetic_message(message, full_command, outputs.append)),
+                        timeout
                     )
-                    
-                    if i < len(data["commands"]) - 1:
-                        await asyncio.sleep(3)
-                
-                break
+                    status = "✅"
+                except asyncio.TimeoutError:
+                    status = "⌛"
+                except Exception as e:
+                    logger.error(f"Alias command {command} failed: {e}")
+                    status = "❌"
+                    outputs.append(str(e))
+            results[index] = (status, time.perf_counter() - started, outputs[-1] if outputs else "")
+            await update_summary()
+
+        await update_summary()
+        await asyncio.gather(*(
+            run(index, command, full_command)
+            for index, (command, full_command) in enumerate(full_commands)
+        ))